@@ -0,0 +1,144 @@
+"""
+Compare run times of the statistical tests on the numpy and numba backends
+against the per-run scipy loops they replaced.
+
+Usage:
+    python -m benchmarks.bench_kernels
+"""
+import time
+import numpy as np
+import scipy.stats as stats
+from src.datagen import ABTestGenerator
+from src.kernels import NUMBA_AVAILABLE
+from src.tests import t_test_clicks, t_test_ctr, mw_test, bootstrap_test
+
+
+# Copies of the per-run implementations the kernels replaced.
+
+
+def baseline_t_test(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    n_runs = a.shape[0]
+    result = np.zeros(n_runs)
+    for i in range(n_runs):
+        result[i] = stats.ttest_ind(a[i], b[i], alternative='two-sided').pvalue
+    return result
+
+
+def baseline_t_test_clicks(results: dict[str, np.ndarray]) -> np.ndarray:
+    return baseline_t_test(results['clicks_0'], results['clicks_1'])
+
+
+def baseline_t_test_ctr(results: dict[str, np.ndarray]) -> np.ndarray:
+    n_runs = results['clicks_0'].shape[0]
+    ctrs_0 = []
+    ctrs_1 = []
+    for i in range(n_runs):
+        ctrs_0.append(results['clicks_0'][i] / results['views_0'][i])
+        ctrs_1.append(results['clicks_1'][i] / results['views_1'][i])
+    return baseline_t_test(np.array(ctrs_0), np.array(ctrs_1))
+
+
+def baseline_mw_test(results: dict[str, np.ndarray]) -> np.ndarray:
+    a = results['clicks_0']
+    b = results['clicks_1']
+    n_runs = a.shape[0]
+    result = np.zeros(n_runs)
+    for i in range(n_runs):
+        result[i] = stats.mannwhitneyu(
+            a[i],
+            b[i],
+            alternative='two-sided'
+        ).pvalue
+    return result
+
+
+def baseline_bootstrap_test(results: dict[str, np.ndarray],
+                            n_bootstrap: int = 1000) -> np.ndarray:
+    clicks_0 = results['clicks_0']
+    clicks_1 = results['clicks_1']
+    views_0 = results['views_0']
+    views_1 = results['views_1']
+    ctrs_0_hat = clicks_0 / views_0
+    ctrs_1_hat = clicks_1 / views_1
+
+    poisson_bootstraps = stats.poisson(1).rvs(
+        (n_bootstrap, ctrs_0_hat.shape[1])
+        ).astype(int)
+
+    values_0 = np.matmul(ctrs_0_hat * views_0, poisson_bootstraps.T)
+    weights_0 = np.matmul(views_0, poisson_bootstraps.T)
+
+    values_1 = np.matmul(ctrs_1_hat * views_1, poisson_bootstraps.T)
+    weights_1 = np.matmul(views_1, poisson_bootstraps.T)
+
+    deltas = values_1 / weights_1 - values_0 / weights_0
+
+    positions = np.sum(deltas < 0, axis=1)
+
+    return 2 * np.minimum(positions, n_bootstrap - positions) / n_bootstrap
+
+
+def best_time(function: callable, n_repeats: int = 3) -> float:
+    """
+    Measure the best wall-clock time of several calls of a function.
+
+    Args:
+        function (callable): Function without arguments to measure.
+        n_repeats (int): Number of calls. Defaults to 3.
+
+    Returns:
+        float: The best time in seconds.
+    """
+    times = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    results = ABTestGenerator(0.02, 0.004, 1000, 0.6).generate_n_experiment(
+        num_users=1000,
+        n_runs=500
+    )
+    test_config = {
+        'T-test, clicks': (t_test_clicks, baseline_t_test_clicks),
+        'T-test, CTR': (t_test_ctr, baseline_t_test_ctr),
+        'Mann–Whitney, clicks': (mw_test, baseline_mw_test),
+        'Bootstrap, CTR': (bootstrap_test, baseline_bootstrap_test)
+    }
+    # The bootstrap test relies on BLAS and has no numba kernel.
+    numpy_only = {'Bootstrap, CTR'}
+
+    if NUMBA_AVAILABLE:
+        import numba
+        print(f'numba threads: {numba.get_num_threads()}')
+    else:
+        print('numba is not installed, only the numpy backend is measured.')
+
+    print(f'{"test":<24}{"baseline, s":>13}{"numpy, s":>10}'
+          f'{"numba, s":>10}{"numba JIT, s":>14}')
+    for test_name, (test_function, baseline) in test_config.items():
+        baseline_time = best_time(lambda: baseline(results))
+        if test_name in numpy_only:
+            numpy_time = best_time(lambda: test_function(results))
+        else:
+            numpy_time = best_time(
+                lambda: test_function(results, backend='numpy')
+            )
+        numba_time = jit_time = float('nan')
+        if NUMBA_AVAILABLE and test_name not in numpy_only:
+            # The first call includes JIT compilation (or cache loading).
+            start = time.perf_counter()
+            test_function(results, backend='numba')
+            jit_time = time.perf_counter() - start
+            numba_time = best_time(
+                lambda: test_function(results, backend='numba')
+            )
+        print(f'{test_name:<24}{baseline_time:>13.4f}{numpy_time:>10.4f}'
+              f'{numba_time:>10.4f}{jit_time:>14.4f}')
+
+
+if __name__ == '__main__':
+    main()
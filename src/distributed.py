@@ -0,0 +1,679 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from multiprocessing.managers import BaseManager
+from typing import Iterator, Optional
+import numpy as np
+from src.datagen import ABTestGenerator
+from src.kernels import NUMBA_AVAILABLE
+from src.utils import apply_tests
+from src.testconfig import TEST_CONFIG
+
+P_VALUE_BINS = 1000
+HEARTBEAT_INTERVAL = 5
+POLL_INTERVAL = 1
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    """
+    A range of simulation runs for a single generator configuration.
+
+    Attributes:
+        unit_id (int): Unique id of the work unit within a campaign.
+        config_index (int): Index of the generator configuration.
+        generator_params (dict): Keyword arguments of ABTestGenerator.
+        test_names (tuple[str, ...]): Names of the tests from TEST_CONFIG.
+        num_users (int): The number of users in each experiment.
+        run_start (int): Index of the first run, inclusive.
+        run_stop (int): Index of the last run, exclusive.
+        seed (int): Seed of the random state used for the unit.
+    """
+    unit_id: int
+    config_index: int
+    generator_params: dict
+    test_names: tuple[str, ...]
+    num_users: int
+    run_start: int
+    run_stop: int
+    seed: int
+
+
+def plan_campaign(configs: list[dict], test_names: list[str],
+                  num_users: int, n_runs: int, runs_per_unit: int,
+                  seed: int = 0) -> list[WorkUnit]:
+    """
+    Split a simulation campaign into work units.
+
+    The seed of each unit depends only on the campaign seed, the index
+    of the configuration and the first run of the unit, so the results
+    do not depend on the backend, the number of workers or retries.
+
+    Args:
+        configs (list[dict]): Keyword arguments of ABTestGenerator
+            for each generator configuration.
+        test_names (list[str]): Names of the tests from TEST_CONFIG.
+        num_users (int): The number of users in each experiment.
+        n_runs (int): The number of experiments for each configuration.
+        runs_per_unit (int): The maximal number of runs in a work unit.
+        seed (int): Seed of the campaign. Defaults to 0.
+
+    Returns:
+        list[WorkUnit]: Work units covering all runs of all configurations.
+    """
+    unknown = set(test_names) - set(TEST_CONFIG)
+    if unknown:
+        raise ValueError(f'Unknown tests: {sorted(unknown)}.')
+    units = []
+    for config_index, generator_params in enumerate(configs):
+        for run_start in range(0, n_runs, runs_per_unit):
+            unit_seed = np.random.SeedSequence(
+                [seed, config_index, run_start]
+            ).generate_state(1)[0]
+            units.append(WorkUnit(
+                unit_id=len(units),
+                config_index=config_index,
+                generator_params=dict(generator_params),
+                test_names=tuple(test_names),
+                num_users=num_users,
+                run_start=run_start,
+                run_stop=min(run_start + runs_per_unit, n_runs),
+                seed=int(unit_seed)
+            ))
+    return units
+
+
+def summarize_p_vals(p_vals: np.ndarray,
+                     n_bins: int = P_VALUE_BINS) -> dict:
+    """
+    Summarize p-values with a histogram over [0, 1].
+
+    NaN p-values, e.g. of T-tests on runs with zero variance, are not
+    counted in the histogram nor in the number of runs, but separately.
+
+    Args:
+        p_vals (np.ndarray): Array of p-values.
+        n_bins (int): Number of histogram bins. Defaults to P_VALUE_BINS.
+
+    Returns:
+        dict: A dictionary with bin counts, the number of runs with
+            a p-value and the number of runs with NaN p-value.
+    """
+    p_vals = np.asarray(p_vals, dtype=np.float64)
+    is_nan = np.isnan(p_vals)
+    counts, _ = np.histogram(p_vals[~is_nan], bins=n_bins, range=(0, 1))
+    return {
+        'counts': counts,
+        'n_runs': int(np.sum(~is_nan)),
+        'n_nan': int(np.sum(is_nan))
+    }
+
+
+def merge_summaries(summary_a: dict, summary_b: dict) -> dict:
+    """
+    Merge two p-value summaries of the same test.
+
+    Args:
+        summary_a (dict): First p-value summary.
+        summary_b (dict): Second p-value summary.
+
+    Returns:
+        dict: Summary of the union of the runs.
+    """
+    return {
+        'counts': summary_a['counts'] + summary_b['counts'],
+        'n_runs': summary_a['n_runs'] + summary_b['n_runs'],
+        'n_nan': summary_a['n_nan'] + summary_b['n_nan']
+    }
+
+
+def summary_power(summary: dict, alpha: float = 0.05) -> float:
+    """
+    Calculate the share of p-values below alpha from a p-value summary.
+
+    The share is taken over the runs with a p-value, and it is exact
+    when alpha is a multiple of the bin width.
+
+    Args:
+        summary (dict): P-value summary.
+        alpha (float): Significance level. Defaults to 0.05.
+
+    Returns:
+        float: Share of runs with p-value below alpha, or NaN if no run
+            has a p-value.
+    """
+    if summary['n_runs'] == 0:
+        return np.nan
+    n_bins = len(summary['counts'])
+    n_below = int(np.floor(alpha * n_bins + 1e-9))
+    return summary['counts'][:n_below].sum() / summary['n_runs']
+
+
+def run_work_unit(unit: WorkUnit) -> dict[str, dict]:
+    """
+    Simulate the runs of a work unit and summarize p-values of its tests.
+
+    Args:
+        unit (WorkUnit): Work unit to run.
+
+    Returns:
+        dict[str, dict]: P-value summaries for each test of the unit.
+    """
+    # ABTestGenerator and the tests draw from the global numpy random state,
+    # which is restored for callers running units in their own process.
+    random_state = np.random.get_state()
+    np.random.seed(unit.seed)
+    try:
+        datagen = ABTestGenerator(**unit.generator_params)
+        results = datagen.generate_n_experiment(
+            unit.num_users,
+            unit.run_stop - unit.run_start
+        )
+        test_config = {test_name: TEST_CONFIG[test_name]
+                       for test_name in unit.test_names}
+        test_results = apply_tests(results, test_config=test_config)
+    finally:
+        np.random.set_state(random_state)
+    return {test_name: summarize_p_vals(test_result['p_vals'])
+            for test_name, test_result in test_results.items()}
+
+
+class WorkUnitError(Exception):
+    """
+    Raised when a work unit fails with an exception.
+
+    A rerun uses the same seed and fails the same way,
+    so such units are not retried.
+    """
+
+
+class WorkUnitLost(Exception):
+    """
+    Raised when no result of a work unit arrives, e.g. its worker died.
+    """
+
+
+def _init_worker() -> None:
+    """
+    Limit numba to one thread in a worker process, so that n workers
+    do not start n times as many threads as there are cores.
+    """
+    if NUMBA_AVAILABLE:
+        import numba
+        numba.set_num_threads(1)
+
+
+def _execute(unit: WorkUnit
+             ) -> tuple[WorkUnit, Optional[dict], Optional[Exception]]:
+    """
+    Run a work unit and capture a failure.
+
+    Args:
+        unit (WorkUnit): Work unit to run.
+
+    Returns:
+        tuple[WorkUnit, Optional[dict], Optional[Exception]]: The unit,
+            its p-value summaries and None, or the unit, None and
+            WorkUnitError with the traceback if the unit failed.
+    """
+    try:
+        return unit, run_work_unit(unit), None
+    except Exception:
+        return unit, None, WorkUnitError(
+            f'Work unit {unit.unit_id} failed:\n{traceback.format_exc()}'
+        )
+
+
+class Backend:
+    """
+    Base class of the backends executing work units.
+
+    Backends are used as context managers, `map` is called within
+    the context, possibly several times.
+    """
+
+    def start(self) -> None:
+        """
+        Acquire the resources of the backend.
+        """
+
+    def close(self) -> None:
+        """
+        Release the resources of the backend.
+        """
+
+    def map(self, units: list[WorkUnit]
+            ) -> Iterator[tuple[WorkUnit, Optional[dict],
+                                Optional[Exception]]]:
+        """
+        Execute work units.
+
+        Args:
+            units (list[WorkUnit]): Work units to execute.
+
+        Yields:
+            tuple[WorkUnit, Optional[dict], Optional[Exception]]: The unit,
+                its p-value summaries and None, or the unit, None and
+                WorkUnitError or WorkUnitLost, in the order of completion.
+        """
+        raise NotImplementedError
+
+    def __enter__(self) -> 'Backend':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+
+class InProcessBackend(Backend):
+    """
+    Backend executing work units one by one in the current process.
+    """
+
+    def map(self, units):
+        for unit in units:
+            yield _execute(unit)
+
+
+def _run_local_worker(worker_id: int, tasks, results) -> None:
+    """
+    Execute work units of a MultiprocessingBackend worker until a None
+    sentinel arrives.
+
+    Args:
+        worker_id (int): Id of the worker.
+        tasks: Queue of work units of this worker only.
+        results: Queue receiving results of all workers.
+    """
+    _init_worker()
+    while True:
+        unit = tasks.get()
+        if unit is None:
+            break
+        results.put((worker_id, _execute(unit)))
+
+
+class MultiprocessingBackend(Backend):
+    """
+    Backend executing work units in local worker processes.
+
+    Each worker gets one unit at a time through its own queue, so the unit
+    of a worker that died is known and reported as lost, while slow units
+    are waited for. Workers are spawned rather than forked, as forking
+    a process that has run numba's threaded kernels is unsafe.
+    """
+
+    def __init__(self, n_workers: Optional[int] = None):
+        """
+        Initialize the MultiprocessingBackend object.
+
+        Args:
+            n_workers (int, optional): The number of worker processes.
+                Defaults to the number of CPUs.
+        """
+        self.n_workers = n_workers or multiprocessing.cpu_count()
+        self.context = multiprocessing.get_context('spawn')
+        self.results = None
+        self.workers = {}
+        self.n_started = 0
+
+    def _start_workers(self) -> None:
+        """
+        Start workers until there are n_workers of them.
+        """
+        while len(self.workers) < self.n_workers:
+            tasks = self.context.SimpleQueue()
+            process = self.context.Process(
+                target=_run_local_worker,
+                args=(self.n_started, tasks, self.results),
+                daemon=True
+            )
+            process.start()
+            self.workers[self.n_started] = (process, tasks)
+            self.n_started += 1
+
+    def start(self):
+        self.results = self.context.Queue()
+        self._start_workers()
+
+    def close(self):
+        for process, tasks in self.workers.values():
+            tasks.put(None)
+        for process, _ in self.workers.values():
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.workers = {}
+        self.results = None
+
+    def map(self, units):
+        queued = list(reversed(units))
+        pending = {unit.unit_id for unit in units}
+        assigned = {}
+        while pending:
+            for worker_id, (process, _) in list(self.workers.items()):
+                if process.is_alive():
+                    continue
+                del self.workers[worker_id]
+                unit = assigned.pop(worker_id, None)
+                if unit is not None and unit.unit_id in pending:
+                    pending.remove(unit.unit_id)
+                    yield unit, None, WorkUnitLost(
+                        f'Worker {worker_id} died running work unit '
+                        f'{unit.unit_id}.'
+                    )
+            self._start_workers()
+            for worker_id, (_, tasks) in self.workers.items():
+                if worker_id not in assigned and queued:
+                    assigned[worker_id] = queued.pop()
+                    tasks.put(assigned[worker_id])
+            try:
+                worker_id, result = self.results.get(
+                    timeout=POLL_INTERVAL
+                )
+            except queue.Empty:
+                continue
+            assigned.pop(worker_id, None)
+            # Results of units reported as lost earlier may arrive late.
+            if result[0].unit_id in pending:
+                pending.remove(result[0].unit_id)
+                yield result
+
+
+def _collect(results, units: list[WorkUnit], heartbeat_timeout: float
+             ) -> Iterator[tuple[WorkUnit, Optional[dict],
+                                 Optional[Exception]]]:
+    """
+    Collect the results of work units from a queue fed by `_worker_loop`.
+
+    A unit is reported as lost when a worker has started it and no
+    heartbeat arrived for `heartbeat_timeout` seconds. Units that no
+    worker has started yet are waited for, however slow the campaign.
+
+    Args:
+        results: Queue receiving the messages of the workers.
+        units (list[WorkUnit]): Work units in flight.
+        heartbeat_timeout (float): Seconds without a heartbeat of a started
+            unit before it is reported as lost.
+
+    Yields:
+        tuple[WorkUnit, Optional[dict], Optional[Exception]]: Results of
+            the units in the order of completion.
+    """
+    pending = {unit.unit_id: unit for unit in units}
+    last_heartbeats = {}
+    poll_interval = min(POLL_INTERVAL, heartbeat_timeout)
+    while pending:
+        try:
+            kind, payload = results.get(timeout=poll_interval)
+        except queue.Empty:
+            kind, payload = None, None
+        now = time.monotonic()
+        # Messages of units reported as lost earlier may arrive late.
+        if kind == 'heartbeat' and payload in pending:
+            last_heartbeats[payload] = now
+        elif kind == 'result' and payload[0].unit_id in pending:
+            unit_id = payload[0].unit_id
+            del pending[unit_id]
+            last_heartbeats.pop(unit_id, None)
+            yield payload
+        for unit_id, last_heartbeat in list(last_heartbeats.items()):
+            if now - last_heartbeat > heartbeat_timeout:
+                del last_heartbeats[unit_id]
+                yield pending.pop(unit_id), None, WorkUnitLost(
+                    f'No heartbeat of work unit {unit_id} '
+                    f'in {heartbeat_timeout} seconds.'
+                )
+
+
+def _worker_loop(tasks, results) -> None:
+    """
+    Execute work units from a task queue until a None sentinel arrives.
+
+    While a unit runs, a background thread sends its id as a heartbeat
+    every HEARTBEAT_INTERVAL seconds, so that a slow unit is not taken
+    for a lost one.
+
+    Args:
+        tasks: Queue of work units.
+        results: Queue receiving heartbeats and results.
+    """
+    _init_worker()
+    while True:
+        # Poll rather than block, so that the queue server does not keep
+        # a pending request of a worker that died.
+        try:
+            unit = tasks.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        if unit is None:
+            break
+        done = threading.Event()
+
+        def send_heartbeats(unit_id=unit.unit_id):
+            results.put(('heartbeat', unit_id))
+            while not done.wait(HEARTBEAT_INTERVAL):
+                results.put(('heartbeat', unit_id))
+
+        heartbeats = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeats.start()
+        try:
+            result = _execute(unit)
+        finally:
+            done.set()
+            heartbeats.join()
+        results.put(('result', result))
+
+
+_task_queue = queue.Queue()
+_result_queue = queue.Queue()
+
+
+def _get_task_queue() -> queue.Queue:
+    return _task_queue
+
+
+def _get_result_queue() -> queue.Queue:
+    return _result_queue
+
+
+class _QueueManager(BaseManager):
+    pass
+
+
+_QueueManager.register('get_task_queue', callable=_get_task_queue)
+_QueueManager.register('get_result_queue', callable=_get_result_queue)
+
+
+def run_worker(address: tuple[str, int], authkey: bytes) -> None:
+    """
+    Execute work units from the queues of a SocketBackend until it stops.
+
+    Args:
+        address (tuple[str, int]): Host and port of the backend.
+        authkey (bytes): Authentication key of the backend.
+    """
+    manager = _QueueManager(address=address, authkey=authkey)
+    manager.connect()
+    try:
+        _worker_loop(manager.get_task_queue(), manager.get_result_queue())
+    except (EOFError, ConnectionError):
+        pass
+
+
+class SocketBackend(Backend):
+    """
+    Backend distributing work units to workers over TCP queues.
+
+    Workers send heartbeats while running a unit, and a unit without
+    heartbeats for `heartbeat_timeout` seconds is reported as lost.
+    The queues exchange pickles, so anyone who knows the authentication
+    key can run code on the backend's node. The key is random unless
+    given. To accept workers from other nodes, bind `address` to
+    a non-loopback interface, e.g. ('0.0.0.0', 50000), and start them with
+    `python -m src.distributed worker --address HOST:PORT --authkey KEY`,
+    where KEY is `backend.authkey.hex()`. The queue server and local
+    workers are spawned rather than forked.
+    """
+
+    def __init__(self, address: tuple[str, int] = ('127.0.0.1', 0),
+                 authkey: Optional[bytes] = None,
+                 n_local_workers: int = 0,
+                 heartbeat_timeout: float = 60):
+        """
+        Initialize the SocketBackend object.
+
+        Args:
+            address (tuple[str, int]): Host and port to serve the queues on.
+                Port 0 selects a free port. The default only accepts
+                workers of this node. Defaults to ('127.0.0.1', 0).
+            authkey (bytes, optional): Authentication key workers have
+                to provide. Defaults to None, which generates a random key.
+            n_local_workers (int): The number of worker processes to start
+                on this node. Defaults to 0.
+            heartbeat_timeout (float): Seconds without a heartbeat of
+                a started unit before it is reported as lost. Defaults to 60.
+        """
+        self.address = address
+        self.authkey = authkey if authkey is not None else os.urandom(32)
+        self.n_local_workers = n_local_workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.manager = None
+        self.workers = []
+
+    def _start_workers(self) -> None:
+        """
+        Start local workers, replacing the ones that died.
+        """
+        self.workers = [worker for worker in self.workers
+                        if worker.is_alive()]
+        while len(self.workers) < self.n_local_workers:
+            worker = self.context.Process(target=run_worker,
+                                          args=(self.address, self.authkey),
+                                          daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def start(self):
+        self.manager = _QueueManager(address=self.address,
+                                     authkey=self.authkey,
+                                     ctx=self.context)
+        self.manager.start()
+        self.address = self.manager.address
+        self._start_workers()
+
+    def close(self):
+        if self.manager is None:
+            return
+        tasks = self.manager.get_task_queue()
+        # Drop the units nobody has picked up, e.g. after a failure.
+        while True:
+            try:
+                tasks.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self.workers:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers = []
+        self.manager.shutdown()
+        self.manager = None
+
+    def map(self, units):
+        self._start_workers()
+        tasks = self.manager.get_task_queue()
+        for unit in units:
+            tasks.put(unit)
+        yield from _collect(self.manager.get_result_queue(), units,
+                            self.heartbeat_timeout)
+
+
+class Scheduler:
+    """
+    Scheduler running work units on a backend and merging their results.
+    """
+
+    def __init__(self, backend: Backend, max_retries: int = 2):
+        """
+        Initialize the Scheduler object.
+
+        Args:
+            backend (Backend): Backend executing the work units.
+            max_retries (int): The number of times a lost unit
+                is resubmitted. Defaults to 2.
+        """
+        self.backend = backend
+        self.max_retries = max_retries
+
+    def run(self, units: list[WorkUnit]) -> dict[int, dict[str, dict]]:
+        """
+        Run work units and merge their p-value summaries.
+
+        Lost units are resubmitted, units that raised an exception are not,
+        as they would fail the same way with the same seed.
+
+        Args:
+            units (list[WorkUnit]): Work units to run.
+
+        Returns:
+            dict[int, dict[str, dict]]: Merged p-value summaries for each
+                configuration index and test name.
+        """
+        summaries = defaultdict(dict)
+        with self.backend:
+            for _ in range(self.max_retries + 1):
+                lost = []
+                for unit, unit_summaries, error in self.backend.map(units):
+                    if isinstance(error, WorkUnitLost):
+                        lost.append(unit)
+                        continue
+                    if error is not None:
+                        raise error
+                    config_summaries = summaries[unit.config_index]
+                    for test_name, summary in unit_summaries.items():
+                        if test_name in config_summaries:
+                            summary = merge_summaries(
+                                config_summaries[test_name], summary
+                            )
+                        config_summaries[test_name] = summary
+                if not lost:
+                    return summaries
+                units = lost
+        raise WorkUnitLost(
+            f'{len(lost)} work units were lost after {self.max_retries} '
+            f'retries.'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Worker node of the distributed simulation backend.'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker_parser = subparsers.add_parser('worker')
+    worker_parser.add_argument('--address', required=True,
+                               help='HOST:PORT of the SocketBackend.')
+    worker_parser.add_argument('--authkey', required=True,
+                               help='Hex authentication key of the '
+                                    'SocketBackend.')
+    args = parser.parse_args()
+
+    host, port = args.address.rsplit(':', 1)
+    run_worker((host, int(port)), bytes.fromhex(args.authkey))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """
+        No-op stand-in for numba.njit used when numba is not installed.
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
+
+
+BACKENDS = ('auto', 'numba', 'numpy')
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """
+    Resolve the name of the computational backend to use.
+
+    Args:
+        backend (str): One of 'auto', 'numba' or 'numpy'. 'auto' selects
+            numba when it is installed and falls back to numpy otherwise.
+            Defaults to 'auto'.
+
+    Returns:
+        str: Either 'numba' or 'numpy'.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f'Unknown backend {backend!r}, expected one of {BACKENDS}.'
+        )
+    if backend == 'auto':
+        return 'numba' if NUMBA_AVAILABLE else 'numpy'
+    if backend == 'numba' and not NUMBA_AVAILABLE:
+        raise ImportError('The numba backend requires numba to be installed.')
+    return backend
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _row_moments_numba(x):
+    n_runs, n_users = x.shape
+    means = np.empty(n_runs)
+    variances = np.empty(n_runs)
+    for i in prange(n_runs):
+        total = 0.0
+        for j in range(n_users):
+            total += x[i, j]
+        mean = total / n_users
+        m2 = 0.0
+        for j in range(n_users):
+            m2 += (x[i, j] - mean) ** 2
+        means[i] = mean
+        variances[i] = m2 / (n_users - 1) if n_users > 1 else np.nan
+    return means, variances
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _rank_sums_numba(a, b):
+    n_runs, n_0 = a.shape
+    n_1 = b.shape[1]
+    n = n_0 + n_1
+    rank_sums = np.empty(n_runs)
+    tie_terms = np.empty(n_runs)
+    for i in prange(n_runs):
+        pooled = np.empty(n)
+        pooled[:n_0] = a[i]
+        pooled[n_0:] = b[i]
+        order = np.argsort(pooled, kind='mergesort')
+        rank_sum = 0.0
+        tie_term = 0.0
+        start = 0
+        while start < n:
+            value = pooled[order[start]]
+            end = start
+            while end + 1 < n and pooled[order[end + 1]] == value:
+                end += 1
+            rank = (start + end) / 2 + 1
+            for k in range(start, end + 1):
+                if order[k] < n_0:
+                    rank_sum += rank
+            t = end - start + 1
+            tie_term += t * t * t - t
+            start = end + 1
+        rank_sums[i] = rank_sum
+        tie_terms[i] = tie_term
+    return rank_sums, tie_terms
+
+
+def row_moments(x: np.ndarray,
+                backend: str = 'auto') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the mean and the unbiased variance of each run.
+
+    Args:
+        x (np.ndarray): Array of shape (n_runs, n_users).
+        backend (str): Computational backend. Defaults to 'auto'.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Means and variances (ddof=1)
+            of each run.
+    """
+    if resolve_backend(backend) == 'numba':
+        return _row_moments_numba(
+            np.ascontiguousarray(x, dtype=np.float64)
+        )
+    x = np.asarray(x, dtype=np.float64)
+    return x.mean(axis=1), x.var(axis=1, ddof=1)
+
+
+def rank_sums(a: np.ndarray, b: np.ndarray,
+              backend: str = 'auto') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate tie-aware rank sums of the first sample in each run.
+
+    Ranks are computed over the pooled sample of the run, tied values
+    receive the average of the ranks they span.
+
+    Args:
+        a (np.ndarray): Array of shape (n_runs, n_0).
+        b (np.ndarray): Array of shape (n_runs, n_1).
+        backend (str): Computational backend. Defaults to 'auto'.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Rank sums of the first sample and
+            tie correction terms sum(t^3 - t) over groups of tied values.
+    """
+    if resolve_backend(backend) == 'numba':
+        return _rank_sums_numba(
+            np.ascontiguousarray(a, dtype=np.float64),
+            np.ascontiguousarray(b, dtype=np.float64)
+        )
+    n_0 = a.shape[1]
+    pooled = np.concatenate([a, b], axis=1).astype(np.float64)
+    n_runs, n = pooled.shape
+    order = np.argsort(pooled, axis=1, kind='mergesort')
+    pooled_sorted = np.take_along_axis(pooled, order, axis=1)
+
+    is_new = pooled_sorted[:, 1:] != pooled_sorted[:, :-1]
+    edge = np.ones((n_runs, 1), dtype=bool)
+    positions = np.broadcast_to(np.arange(n), (n_runs, n))
+    starts = np.maximum.accumulate(
+        np.where(np.hstack([edge, is_new]), positions, 0), axis=1
+    )
+    ends = np.minimum.accumulate(
+        np.where(np.hstack([is_new, edge]), positions, n)[:, ::-1], axis=1
+    )[:, ::-1]
+
+    ranks = (starts + ends) / 2 + 1
+    tie_sizes = ends - starts + 1
+    rank_sum = np.sum(ranks, axis=1, where=order < n_0)
+    # Each element of a tie group of size t contributes t^2 - 1,
+    # so the group as a whole contributes t^3 - t.
+    tie_term = np.sum(tie_sizes ** 2 - 1, axis=1).astype(np.float64)
+    return rank_sum, tie_term
+
+
+def bootstrap_positions(clicks_0: np.ndarray, views_0: np.ndarray,
+                        clicks_1: np.ndarray, views_1: np.ndarray,
+                        weights: np.ndarray) -> np.ndarray:
+    """
+    Count bootstrap samples with a negative global CTR difference.
+
+    The weighted sums are float matrix products, which numpy hands over
+    to BLAS, so there is no numba counterpart of this kernel.
+
+    Args:
+        clicks_0 (np.ndarray): Clicks of the control group.
+        views_0 (np.ndarray): Views of the control group.
+        clicks_1 (np.ndarray): Clicks of the treatment group.
+        views_1 (np.ndarray): Views of the treatment group.
+        weights (np.ndarray): Bootstrap weights of shape
+            (n_bootstrap, n_users).
+
+    Returns:
+        np.ndarray: Number of bootstrap samples in each run where
+            the treatment CTR is below the control CTR.
+    """
+    weights_t = np.asarray(weights, dtype=np.float64).T
+    values_0 = np.matmul(np.asarray(clicks_0, dtype=np.float64), weights_t)
+    weights_0 = np.matmul(np.asarray(views_0, dtype=np.float64), weights_t)
+
+    values_1 = np.matmul(np.asarray(clicks_1, dtype=np.float64), weights_t)
+    weights_1 = np.matmul(np.asarray(views_1, dtype=np.float64), weights_t)
+
+    deltas = values_1 / weights_1 - values_0 / weights_0
+    return np.sum(deltas < 0, axis=1)
@@ -0,0 +1,230 @@
+import numpy as np
+import scipy.stats as stats
+from src.kernels import row_moments
+
+
+def _two_sided_p_value(delta: np.ndarray, se: np.ndarray,
+                       df: np.ndarray = None) -> np.ndarray:
+    """
+    Calculate two-sided p-values of a t or z statistic.
+
+    Runs with zero standard error get p-value 1 when there is no
+    difference and NaN otherwise, as there is no evidence either way.
+
+    Args:
+        delta (np.ndarray): Differences of the estimates for each run.
+        se (np.ndarray): Standard errors of the differences.
+        df (np.ndarray, optional): Degrees of freedom of the t-distribution.
+            The normal distribution is used if None. Defaults to None.
+
+    Returns:
+        np.ndarray: An array containing the p-values for each run.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stat = np.abs(delta) / se
+        if df is None:
+            p_vals = 2 * stats.norm(0, 1).sf(stat)
+        else:
+            p_vals = 2 * stats.t(df).sf(stat)
+    zero_se = se == 0
+    p_vals[zero_se] = np.where(delta[zero_se] == 0, 1.0, np.nan)
+    return p_vals
+
+
+def _linearized_clicks(results: dict[str, np.ndarray]
+                       ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate linearized clicks of control and treatment groups.
+
+    Linearized clicks are clicks - CTR_0 * views, where CTR_0 is the
+    global CTR of the control group in the run. Unlike raw clicks, which
+    are mostly zeros, they spread with the views of the users, and
+    a difference of their means is proportional to the difference of
+    global CTRs.
+
+    Args:
+        results (dict[str, np.ndarray]): A dictionary containing
+            A/B test results.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Linearized clicks of control and
+            treatment groups.
+    """
+    ctr_0 = (
+        results['clicks_0'].sum(axis=1) / results['views_0'].sum(axis=1)
+    )[:, np.newaxis]
+    return (
+        results['clicks_0'] - ctr_0 * results['views_0'],
+        results['clicks_1'] - ctr_0 * results['views_1']
+    )
+
+
+def _order_statistics(x: np.ndarray, kth: list[int]) -> np.ndarray:
+    """
+    Partition each run so that the order statistics `kth` are in place.
+
+    Args:
+        x (np.ndarray): Array of shape (n_runs, n_users).
+        kth (list[int]): Indices of the order statistics.
+
+    Returns:
+        np.ndarray: Partitioned copy of x.
+    """
+    return np.partition(x, sorted(set(kth)), axis=1)
+
+
+def _trimmed_moments(x: np.ndarray, trim: float,
+                     backend: str = 'auto'
+                     ) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Calculate the trimmed mean and Yuen's squared standard error of each run.
+
+    Args:
+        x (np.ndarray): Array of shape (n_runs, n_users).
+        trim (float): Proportion of observations cut from each tail.
+        backend (str): Computational backend. Defaults to 'auto'.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, int]: Trimmed means, squared standard
+            errors of the trimmed means and the number of observations
+            left after trimming.
+    """
+    n = x.shape[1]
+    g = int(np.floor(trim * n))
+    h = n - 2 * g
+    x = np.asarray(x, dtype=np.float64)
+    partitioned = _order_statistics(x, [g, n - g - 1])
+    trimmed_mean = partitioned[:, g:n - g].mean(axis=1)
+    winsorized = np.clip(
+        x,
+        partitioned[:, [g]],
+        partitioned[:, [n - g - 1]]
+    )
+    _, winsorized_var = row_moments(winsorized, backend=backend)
+    se_squared = (n - 1) * winsorized_var / (h * (h - 1))
+    return trimmed_mean, se_squared, h
+
+
+def yuen_test(results: dict[str, np.ndarray], trim: float = 0.05,
+              backend: str = 'auto') -> np.ndarray:
+    """
+    Perform Yuen's trimmed-mean T-test for linearized clicks
+    in A/B test results.
+
+    Args:
+        results (dict[str, np.ndarray]): A dictionary containing
+            A/B test results.
+        trim (float): Proportion of observations cut from each tail.
+            Defaults to 0.05, which keeps most of the users with clicks
+            when only a few percent of users click.
+        backend (str): Computational backend, one of 'auto', 'numba'
+            or 'numpy'. Defaults to 'auto'.
+
+    Returns:
+        np.ndarray: An array containing the p-values of Yuen's test
+            for each experiment.
+    """
+    linearized_0, linearized_1 = _linearized_clicks(results)
+    mean_0, d_0, h_0 = _trimmed_moments(linearized_0, trim, backend)
+    mean_1, d_1, h_1 = _trimmed_moments(linearized_1, trim, backend)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df = (d_0 + d_1)**2 / (d_0**2 / (h_0 - 1) + d_1**2 / (h_1 - 1))
+    return _two_sided_p_value(mean_1 - mean_0, np.sqrt(d_0 + d_1), df)
+
+
+def _winsorize_views(clicks: np.ndarray, views: np.ndarray,
+                     limit: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cap the views of the heaviest users at the upper quantile of each run.
+
+    Clicks of the capped users are scaled down proportionally, so their
+    CTR estimates stay unchanged.
+
+    Args:
+        clicks (np.ndarray): Clicks of shape (n_runs, n_users).
+        views (np.ndarray): Views of shape (n_runs, n_users).
+        limit (float): Proportion of the heaviest users to cap.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Winsorized clicks and views.
+    """
+    n = views.shape[1]
+    k = n - 1 - int(np.floor(limit * n))
+    cap = _order_statistics(views, [k])[:, [k]]
+    views_w = np.minimum(views, cap).astype(np.float64)
+    clicks_w = clicks * views_w / views
+    return clicks_w, views_w
+
+
+def winsorized_ctr_test(results: dict[str, np.ndarray], limit: float = 0.01,
+                        backend: str = 'auto') -> np.ndarray:
+    """
+    Perform delta-method Z-test for global CTR with winsorized views.
+
+    Args:
+        results (dict[str, np.ndarray]): A dictionary containing
+            A/B test results.
+        limit (float): Proportion of the heaviest users whose views are
+            capped. Defaults to 0.01.
+        backend (str): Computational backend, one of 'auto', 'numba'
+            or 'numpy'. Defaults to 'auto'.
+
+    Returns:
+        np.ndarray: An array containing the p-values of winsorized CTR test
+            for each experiment.
+    """
+    ctrs = []
+    variances = []
+    for group in ('0', '1'):
+        clicks, views = _winsorize_views(
+            results[f'clicks_{group}'],
+            results[f'views_{group}'],
+            limit
+        )
+        n = clicks.shape[1]
+        mean_clicks, var_clicks = row_moments(clicks, backend=backend)
+        mean_views, var_views = row_moments(views, backend=backend)
+        cov = (
+            np.sum(clicks * views, axis=1) - n * mean_clicks * mean_views
+        ) / (n - 1)
+        ctr = mean_clicks / mean_views
+        ctrs.append(ctr)
+        variances.append(
+            (var_clicks - 2 * ctr * cov + ctr**2 * var_views)
+            / (n * mean_views**2)
+        )
+    se = np.sqrt(np.maximum(variances[0] + variances[1], 0))
+    return _two_sided_p_value(ctrs[1] - ctrs[0], se)
+
+
+def quantile_test(results: dict[str, np.ndarray],
+                  q: float = 0.9) -> np.ndarray:
+    """
+    Perform Mood's quantile test for linearized clicks in A/B test results.
+
+    The q-quantile of the pooled sample is found in each run, and the
+    shares of users above it are compared with a two-proportion Z-test.
+    Under H0 both groups share the q-quantile. Unlike a comparison of
+    sample quantiles, the test stays informative for data with many ties.
+
+    Args:
+        results (dict[str, np.ndarray]): A dictionary containing
+            A/B test results.
+        q (float): Quantile to compare, between 0 and 1. Defaults to 0.9.
+
+    Returns:
+        np.ndarray: An array containing the p-values of quantile test
+            for each experiment.
+    """
+    linearized_0, linearized_1 = _linearized_clicks(results)
+    n_0 = linearized_0.shape[1]
+    n_1 = linearized_1.shape[1]
+    pooled = np.concatenate([linearized_0, linearized_1], axis=1)
+    k = int(np.floor(q * (n_0 + n_1 - 1)))
+    threshold = _order_statistics(pooled, [k])[:, [k]]
+
+    share_0 = np.mean(linearized_0 > threshold, axis=1)
+    share_1 = np.mean(linearized_1 > threshold, axis=1)
+    share = np.mean(pooled > threshold, axis=1)
+    se = np.sqrt(share * (1 - share) * (1/n_0 + 1/n_1))
+    return _two_sided_p_value(share_1 - share_0, se)
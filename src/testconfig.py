@@ -0,0 +1,15 @@
+from src.tests import t_test_clicks, t_test_ctr, mw_test
+from src.tests import binom_test, bootstrap_test
+from src.robusttests import yuen_test, winsorized_ctr_test, quantile_test
+
+# Tests shown in the app and available to distributed simulations.
+TEST_CONFIG = {
+    'T-test, clicks': t_test_clicks,
+    'T-test, CTR': t_test_ctr,
+    'Mann–Whitney, clicks': mw_test,
+    'Binomial, CTR': binom_test,
+    'Bootstrap, CTR': bootstrap_test,
+    'Yuen, linearized clicks': yuen_test,
+    'Winsorized, CTR': winsorized_ctr_test,
+    'Quantile, linearized clicks': quantile_test
+}
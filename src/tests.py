@@ -1,15 +1,44 @@
 import numpy as np
 import scipy.stats as stats
 from src.utils import get_ctrs_hat
+from src.kernels import row_moments, rank_sums, bootstrap_positions
 
 
-def t_test_clicks(results: dict[str, np.ndarray]) -> np.ndarray:
+def _pooled_t_test(a: np.ndarray, b: np.ndarray,
+                   backend: str = 'auto') -> np.ndarray:
+    """
+    Perform two-sample T-test with pooled variance for each run.
+
+    Args:
+        a (np.ndarray): Array of shape (n_runs, n_0).
+        b (np.ndarray): Array of shape (n_runs, n_1).
+        backend (str): Computational backend. Defaults to 'auto'.
+
+    Returns:
+        np.ndarray: An array containing the two-sided p-values
+            for each run.
+    """
+    n_0 = a.shape[1]
+    n_1 = b.shape[1]
+    mean_0, var_0 = row_moments(a, backend=backend)
+    mean_1, var_1 = row_moments(b, backend=backend)
+    df = n_0 + n_1 - 2
+    pooled_var = ((n_0 - 1) * var_0 + (n_1 - 1) * var_1) / df
+    se = np.sqrt(pooled_var * (1/n_0 + 1/n_1))
+    t_stat = (mean_0 - mean_1) / se
+    return 2 * stats.t(df).sf(np.abs(t_stat))
+
+
+def t_test_clicks(results: dict[str, np.ndarray],
+                  backend: str = 'auto') -> np.ndarray:
     """
     Perform two-sample T-test for clicks data in A/B test results.
 
     Args:
         results (dict[str, np.ndarray]): A dictionary containing
             A/B test results.
+        backend (str): Computational backend, one of 'auto', 'numba'
+            or 'numpy'. Defaults to 'auto'.
 
     Returns:
         np.ndarray: An array containing the p-values of T-test
@@ -17,20 +46,19 @@ def t_test_clicks(results: dict[str, np.ndarray]) -> np.ndarray:
     """
     a = results['clicks_0']
     b = results['clicks_1']
-    n_runs = a.shape[0]
-    result = np.zeros(n_runs)
-    for i in range(n_runs):
-        result[i] = stats.ttest_ind(a[i], b[i], alternative='two-sided').pvalue
-    return result
+    return _pooled_t_test(a, b, backend=backend)
 
 
-def t_test_ctr(results: dict[str, np.ndarray]) -> np.ndarray:
+def t_test_ctr(results: dict[str, np.ndarray],
+               backend: str = 'auto') -> np.ndarray:
     """
     Perform two-sample T-test for CTR data in A/B test results.
 
     Args:
         results (dict[str, np.ndarray]): A dictionary containing
             A/B test results.
+        backend (str): Computational backend, one of 'auto', 'numba'
+            or 'numpy'. Defaults to 'auto'.
 
     Returns:
         np.ndarray: An array containing the p-values of T-test
@@ -39,20 +67,21 @@ def t_test_ctr(results: dict[str, np.ndarray]) -> np.ndarray:
     ctrs_hat = get_ctrs_hat(results)
     a = ctrs_hat['ctrs_0_hat']
     b = ctrs_hat['ctrs_1_hat']
-    n_runs = a.shape[0]
-    result = np.zeros(n_runs)
-    for i in range(n_runs):
-        result[i] = stats.ttest_ind(a[i], b[i], alternative='two-sided').pvalue
-    return result
+    return _pooled_t_test(a, b, backend=backend)
 
 
-def mw_test(results: dict[str, np.ndarray]) -> np.ndarray:
+def mw_test(results: dict[str, np.ndarray],
+            backend: str = 'auto') -> np.ndarray:
     """
     Perform Mann-Whitney U test for clicks data in A/B test results.
 
+    Uses the normal approximation with tie and continuity corrections.
+
     Args:
         results (dict[str, np.ndarray]): A dictionary containing
             A/B test results.
+        backend (str): Computational backend, one of 'auto', 'numba'
+            or 'numpy'. Defaults to 'auto'.
 
     Returns:
         np.ndarray: An array containing the p-values of Mann-Whitney U test
@@ -60,15 +89,17 @@ def mw_test(results: dict[str, np.ndarray]) -> np.ndarray:
     """
     a = results['clicks_0']
     b = results['clicks_1']
-    n_runs = a.shape[0]
-    result = np.zeros(n_runs)
-    for i in range(n_runs):
-        result[i] = stats.mannwhitneyu(
-            a[i],
-            b[i],
-            alternative='two-sided'
-        ).pvalue
-    return result
+    n_0 = a.shape[1]
+    n_1 = b.shape[1]
+    n = n_0 + n_1
+    rank_sum, tie_term = rank_sums(a, b, backend=backend)
+
+    u_0 = rank_sum - n_0 * (n_0 + 1) / 2
+    u_stat = np.maximum(u_0, n_0 * n_1 - u_0)
+    mu = n_0 * n_1 / 2
+    sigma = np.sqrt(n_0 * n_1 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    z_stat = (u_stat - mu - 0.5) / sigma
+    return np.clip(2 * stats.norm(0, 1).sf(z_stat), 0, 1)
 
 
 def binom_test(results: dict[str, np.ndarray]) -> np.ndarray:
@@ -108,7 +139,7 @@ def bootstrap_test(results: dict[str, np.ndarray],
     Args:
         results (dict[str, np.ndarray]): A dictionary containing
             A/B test results.
-        n_bootstrap (int): Number of bootstrap samples. Defaults to 2000.
+        n_bootstrap (int): Number of bootstrap samples. Defaults to 1000.
 
     Returns:
         np.ndarray: An array containing the p-values of bootstrap test
@@ -118,21 +149,13 @@ def bootstrap_test(results: dict[str, np.ndarray],
     clicks_1 = results['clicks_1']
     views_0 = results['views_0']
     views_1 = results['views_1']
-    ctrs_0_hat = clicks_0 / views_0
-    ctrs_1_hat = clicks_1 / views_1
 
     poisson_bootstraps = stats.poisson(1).rvs(
-        (n_bootstrap, ctrs_0_hat.shape[1])
+        (n_bootstrap, clicks_0.shape[1])
         ).astype(int)
 
-    values_0 = np.matmul(ctrs_0_hat * views_0, poisson_bootstraps.T)
-    weights_0 = np.matmul(views_0, poisson_bootstraps.T)
-
-    values_1 = np.matmul(ctrs_1_hat * views_1, poisson_bootstraps.T)
-    weights_1 = np.matmul(views_1, poisson_bootstraps.T)
-
-    deltas = values_1 / weights_1 - values_0 / weights_0
-
-    positions = np.sum(deltas < 0, axis=1)
+    positions = bootstrap_positions(
+        clicks_0, views_0, clicks_1, views_1, poisson_bootstraps
+    )
 
     return 2 * np.minimum(positions, n_bootstrap - positions) / n_bootstrap
@@ -14,15 +14,9 @@ def get_ctrs_hat(results: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
         dict[str, np.ndarray]: A dictionary containing estimated CTRs for
             control and treatment groups.
     """
-    n_runs = results['clicks_0'].shape[0]
-    ctrs_0 = []
-    ctrs_1 = []
-    for i in range(n_runs):
-        ctrs_0.append(results['clicks_0'][i] / results['views_0'][i])
-        ctrs_1.append(results['clicks_1'][i] / results['views_1'][i])
     return {
-        'ctrs_0_hat': np.array(ctrs_0),
-        'ctrs_1_hat': np.array(ctrs_1)
+        'ctrs_0_hat': results['clicks_0'] / results['views_0'],
+        'ctrs_1_hat': results['clicks_1'] / results['views_1']
     }
 
 
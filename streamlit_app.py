@@ -4,8 +4,7 @@ from src.datagen import ABTestGenerator
 from src.plots import plot_ctr, plot_views, plot_p_hist_all
 from src.plots import plot_power, plot_p_cdf_all
 from src.utils import apply_tests
-from src.tests import t_test_clicks, t_test_ctr, mw_test
-from src.tests import binom_test, bootstrap_test
+from src.testconfig import TEST_CONFIG
 import numpy as np
 
 # Define global variables to store the results
@@ -156,16 +155,8 @@ def main():
 
     if sb_submit_button or ed_submit:
         # A/B testing part
-        test_config = {
-            'T-test, clicks': t_test_clicks,
-            'T-test, CTR': t_test_ctr,
-            'Mann–Whitney, clicks': mw_test,
-            'Binomial, CTR': binom_test,
-            'Bootstrap, CTR': bootstrap_test
-        }
-
-        p_vals_aa = apply_tests(result_dict_aa, test_config=test_config)
-        p_vals_ab = apply_tests(result_dict_ab, test_config=test_config)
+        p_vals_aa = apply_tests(result_dict_aa, test_config=TEST_CONFIG)
+        p_vals_ab = apply_tests(result_dict_ab, test_config=TEST_CONFIG)
 
         st.subheader("3. A/A Tests Results:")
         c21, c22 = st.columns([1, 1])
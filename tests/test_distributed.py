@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+import numpy as np
+import pytest
+from src.distributed import InProcessBackend, MultiprocessingBackend
+from src.distributed import Scheduler, SocketBackend, WorkUnitError
+from src.distributed import WorkUnitLost, _collect, plan_campaign
+from src.distributed import run_work_unit, summarize_p_vals, summary_power
+
+CONFIGS = [
+    {'base_ctr': 0.02, 'uplift': 0.0, 'beta': 1000, 'skew': 0.6},
+    {'base_ctr': 0.02, 'uplift': 0.01, 'beta': 1000, 'skew': 0.6}
+]
+TEST_NAMES = ['T-test, clicks', 'Binomial, CTR', 'Bootstrap, CTR']
+N_RUNS = 12
+
+
+class FlakyBackend(InProcessBackend):
+    """
+    Backend losing every work unit on its first submission.
+    """
+
+    def __init__(self):
+        self.submitted = set()
+        self.n_maps = 0
+
+    def map(self, units):
+        self.n_maps += 1
+        for unit in units:
+            if unit.unit_id in self.submitted:
+                yield from super().map([unit])
+            else:
+                self.submitted.add(unit.unit_id)
+                yield unit, None, WorkUnitLost('Worker died.')
+
+
+def assert_summaries_equal(summaries_a, summaries_b):
+    assert summaries_a.keys() == summaries_b.keys()
+    for config_index, config_summaries in summaries_a.items():
+        assert config_summaries.keys() == summaries_b[config_index].keys()
+        for test_name, summary in config_summaries.items():
+            other = summaries_b[config_index][test_name]
+            np.testing.assert_array_equal(summary['counts'], other['counts'])
+            assert summary['n_runs'] == other['n_runs']
+            assert summary['n_nan'] == other['n_nan']
+
+
+@pytest.fixture(scope='module')
+def units():
+    return plan_campaign(CONFIGS, TEST_NAMES, num_users=200, n_runs=N_RUNS,
+                         runs_per_unit=4, seed=42)
+
+
+@pytest.fixture(scope='module')
+def reference(units):
+    return Scheduler(InProcessBackend()).run(units)
+
+
+def test_in_process_covers_all_runs(reference):
+    assert sorted(reference) == list(range(len(CONFIGS)))
+    for config_summaries in reference.values():
+        assert sorted(config_summaries) == sorted(TEST_NAMES)
+        for summary in config_summaries.values():
+            assert summary['counts'].sum() == summary['n_runs']
+            assert summary['n_runs'] + summary['n_nan'] == N_RUNS
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda: MultiprocessingBackend(n_workers=2),
+    lambda: SocketBackend(n_local_workers=2)
+], ids=['multiprocessing', 'socket'])
+def test_backends_match_in_process(units, reference, make_backend):
+    summaries = Scheduler(make_backend()).run(units)
+    assert_summaries_equal(summaries, reference)
+
+
+def test_lost_units_are_retried(units, reference):
+    backend = FlakyBackend()
+    summaries = Scheduler(backend, max_retries=1).run(units)
+    assert backend.n_maps == 2
+    assert_summaries_equal(summaries, reference)
+
+
+def test_lost_units_fail_after_retries(units):
+    with pytest.raises(WorkUnitLost):
+        Scheduler(FlakyBackend(), max_retries=0).run(units)
+
+
+def test_multiprocessing_backend_replaces_dead_workers(units, reference):
+    backend = MultiprocessingBackend(n_workers=2)
+
+    def kill_worker():
+        while len(backend.workers) < 2:
+            time.sleep(0.01)
+        process, _ = next(iter(backend.workers.values()))
+        process.terminate()
+
+    killer = threading.Thread(target=kill_worker)
+    killer.start()
+    summaries = Scheduler(backend, max_retries=1).run(units)
+    killer.join()
+    assert backend.n_started > 2
+    assert_summaries_equal(summaries, reference)
+
+
+def test_collect_reports_units_without_heartbeats_as_lost(units):
+    results = queue.Queue()
+    results.put(('heartbeat', units[0].unit_id))
+    results.put(('result', (units[1], {}, None)))
+    collected = list(_collect(results, units[:2], heartbeat_timeout=0.2))
+    assert collected[0] == (units[1], {}, None)
+    assert collected[1][0] == units[0]
+    assert isinstance(collected[1][2], WorkUnitLost)
+
+
+def test_collect_waits_for_slow_units_with_heartbeats(units):
+    results = queue.Queue()
+
+    def run_slow_unit():
+        for _ in range(5):
+            results.put(('heartbeat', units[0].unit_id))
+            time.sleep(0.1)
+        results.put(('result', (units[0], {}, None)))
+
+    worker = threading.Thread(target=run_slow_unit)
+    worker.start()
+    collected = list(_collect(results, units[:1], heartbeat_timeout=0.3))
+    worker.join()
+    assert collected == [(units[0], {}, None)]
+
+
+def test_run_work_unit_restores_random_state(units):
+    np.random.seed(0)
+    expected = np.random.random_sample(3)
+    np.random.seed(0)
+    run_work_unit(units[0])
+    np.testing.assert_array_equal(np.random.random_sample(3), expected)
+
+
+def test_summary_power_without_p_values_is_nan():
+    summary = summarize_p_vals(np.array([np.nan, np.nan]))
+    assert summary['n_nan'] == 2
+    assert np.isnan(summary_power(summary))
+
+
+def test_failed_units_are_not_retried():
+    units = plan_campaign([{'base_ctr': 0.02}], TEST_NAMES, num_users=10,
+                          n_runs=2, runs_per_unit=1)
+    backend = FlakyBackend()
+    backend.submitted.update(unit.unit_id for unit in units)
+    with pytest.raises(WorkUnitError):
+        Scheduler(backend, max_retries=2).run(units)
+    assert backend.n_maps == 1
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from src.kernels import NUMBA_AVAILABLE, rank_sums, resolve_backend
+from src.kernels import row_moments
+
+pytestmark = pytest.mark.skipif(not NUMBA_AVAILABLE,
+                                reason='numba is not installed')
+
+
+@pytest.fixture(scope='module')
+def samples():
+    rng = np.random.default_rng(0)
+    # Few distinct values give many ties of different sizes.
+    return rng.integers(0, 5, (10, 40)), rng.integers(0, 5, (10, 60))
+
+
+def test_auto_selects_numba():
+    assert resolve_backend('auto') == 'numba'
+
+
+def test_row_moments_backends_agree(samples):
+    a, _ = samples
+    for expected, actual in zip(row_moments(a, backend='numpy'),
+                                row_moments(a, backend='numba')):
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+
+def test_rank_sums_backends_agree(samples):
+    a, b = samples
+    for expected, actual in zip(rank_sums(a, b, backend='numpy'),
+                                rank_sums(a, b, backend='numba')):
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+import scipy.stats as stats
+from src.datagen import ABTestGenerator
+from src.robusttests import _linearized_clicks, _two_sided_p_value
+from src.robusttests import quantile_test, winsorized_ctr_test, yuen_test
+
+
+@pytest.fixture(scope='module')
+def results():
+    np.random.seed(0)
+    return ABTestGenerator(0.02, 0.004, 1000, 2.0).generate_n_experiment(
+        num_users=300,
+        n_runs=20
+    )
+
+
+def test_yuen_test_without_trimming_is_welch_test(results):
+    linearized_0, linearized_1 = _linearized_clicks(results)
+    expected = stats.ttest_ind(linearized_1, linearized_0, axis=1,
+                               equal_var=False).pvalue
+    np.testing.assert_allclose(yuen_test(results, trim=0), expected,
+                               rtol=1e-10)
+
+
+def test_yuen_test_is_computed_per_run(results):
+    chunks = [
+        yuen_test({key: value[i:i + 4] for key, value in results.items()})
+        for i in range(0, 20, 4)
+    ]
+    np.testing.assert_allclose(np.concatenate(chunks), yuen_test(results))
+
+
+def test_winsorized_ctr_test_without_capping_is_delta_method(results):
+    ctrs = []
+    variances = []
+    for group in ('0', '1'):
+        clicks = results[f'clicks_{group}'].astype(np.float64)
+        views = results[f'views_{group}'].astype(np.float64)
+        n = clicks.shape[1]
+        ctr = clicks.sum(axis=1) / views.sum(axis=1)
+        residuals = clicks - ctr[:, np.newaxis] * views
+        ctrs.append(ctr)
+        variances.append(
+            residuals.var(axis=1, ddof=1) / (n * views.mean(axis=1)**2)
+        )
+    z_stat = (ctrs[1] - ctrs[0]) / np.sqrt(variances[0] + variances[1])
+    expected = 2 * stats.norm.sf(np.abs(z_stat))
+    np.testing.assert_allclose(winsorized_ctr_test(results, limit=0),
+                               expected, rtol=1e-8)
+
+
+def test_quantile_test_returns_p_values(results):
+    p_vals = quantile_test(results)
+    assert p_vals.shape == (20,)
+    assert np.all((p_vals >= 0) & (p_vals <= 1))
+
+
+def test_zero_se_gives_one_without_difference_and_nan_otherwise():
+    p_vals = _two_sided_p_value(np.array([0.0, 0.5, 1.0]),
+                                np.array([0.0, 0.0, 1.0]))
+    assert p_vals[0] == 1.0
+    assert np.isnan(p_vals[1])
+    assert 0 < p_vals[2] < 1
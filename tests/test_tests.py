@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import scipy.stats as stats
+from src.datagen import ABTestGenerator
+from src.kernels import NUMBA_AVAILABLE
+from src.tests import t_test_clicks, t_test_ctr, mw_test
+
+BACKENDS = [
+    'numpy',
+    pytest.param('numba', marks=pytest.mark.skipif(
+        not NUMBA_AVAILABLE, reason='numba is not installed'
+    ))
+]
+
+
+@pytest.fixture(scope='module')
+def results():
+    # Clicks are mostly zeros, so the samples are full of ties.
+    np.random.seed(0)
+    return ABTestGenerator(0.02, 0.004, 1000, 0.6).generate_n_experiment(
+        num_users=300,
+        n_runs=20
+    )
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_t_test_clicks_matches_scipy(results, backend):
+    expected = stats.ttest_ind(results['clicks_0'], results['clicks_1'],
+                               axis=1).pvalue
+    np.testing.assert_allclose(t_test_clicks(results, backend=backend),
+                               expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_t_test_ctr_matches_scipy(results, backend):
+    expected = stats.ttest_ind(results['clicks_0'] / results['views_0'],
+                               results['clicks_1'] / results['views_1'],
+                               axis=1).pvalue
+    np.testing.assert_allclose(t_test_ctr(results, backend=backend),
+                               expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_mw_test_matches_scipy(results, backend):
+    expected = [
+        stats.mannwhitneyu(a, b, alternative='two-sided',
+                           method='asymptotic').pvalue
+        for a, b in zip(results['clicks_0'], results['clicks_1'])
+    ]
+    np.testing.assert_allclose(mw_test(results, backend=backend),
+                               expected, rtol=1e-10)